@@ -1,4 +1,5 @@
 import os
+from concurrent.futures import ThreadPoolExecutor
 import numpy as np
 import pandas as pd
 import PseudoNetCDF as pnc
@@ -40,12 +41,153 @@ def add_pressure(
         outdf = va_df
     else:
         outdf = va_df.copy()
-    outdf.loc[:, pressurekey] = outdf.loc[:, sigmakey] * (psfc - ptop) + ptop
+    sigma = outdf[sigmakey].to_numpy()
+    pressure = np.multiply(sigma, psfc - ptop)
+    pressure += ptop
+    outdf[pressurekey] = pressure
     return outdf
 
 
+def _fractions_as(layerfractions, dtype):
+    """
+    Cast layer fractions to the type of the data they scale
+
+    Arguments
+    ---------
+    layerfractions : array
+        layer fractions
+    dtype : numpy.dtype
+        type of the variable being allocated
+
+    Returns
+    -------
+    lf : array
+        layerfractions as dtype; raises TypeError if dtype is not floating
+        because fractions cannot be stored in integer variables
+    """
+    if not np.issubdtype(dtype, np.floating):
+        raise TypeError(f'layer fractions cannot scale {dtype} variables')
+    return layerfractions.astype(dtype, copy=False)
+
+
+def _interp_norm(fp, idx, wlo, whi, renorm, out):
+    """
+    Interpolate each column of fp to the output levels and renormalize
+
+    Arguments
+    ---------
+    fp : array
+        (ncolumns, nin) values on the input levels
+    idx : array
+        (nout,) input segment for each output level
+    wlo : array
+        (nout,) weight of idx for each output level (0 below the first
+        input level)
+    whi : array
+        (nout,) weight of idx + 1 for each output level (0 below the first
+        input level)
+    renorm : array
+        (ncolumns,) True where the column should sum to 1
+    out : array
+        (ncolumns, nout) output buffer
+
+    Returns
+    -------
+    out : array
+
+    Notes
+    -----
+    There is deliberately no compiled (numba/Cython/SIMD) version. This
+    runs once per Vertical on a small (sectors x levels) matrix, where a
+    compiled kernel was no faster and added import and compile time.
+    """
+    np.multiply(fp[:, idx], wlo, out=out)
+    out += fp[:, idx + 1] * whi
+    out[renorm] /= out[renorm].sum(axis=1, keepdims=True)
+    return out
+
+
+def _interp_va_mat(va_df, vglvls, vgtop, psfc, metakeys, verbose):
+    """
+    Matrix form of interp_va; see interp_va for arguments
+
+    Returns
+    -------
+    keys : list
+        column names including Sigma
+    outmat : array
+        (len(keys), nz) float64 interpolated values where Sigma holds
+        vglvls[1:]
+    renorm : array
+        (len(keys),) True where the column was renormalized to 1
+    """
+    x = np.asarray(vglvls[1:], dtype='d')
+    if metakeys is None:
+        metakeys = ['Sigma', 'Alt', 'L']
+    xp = (va_df.Pressure.to_numpy(dtype='d') - vgtop) / (psfc - vgtop)
+
+    if xp[-1] < xp[0]:
+        xp = np.ascontiguousarray(xp[::-1])
+        invert = True
+    else:
+        invert = False
+
+    # xp is shared by every column, so search it once and reuse the
+    # segment index and weight for all columns
+    keys = list(va_df.columns)
+    mat = va_df.to_numpy(dtype='d', copy=False)
+    if invert:
+        mat = mat[::-1]
+    # one copy makes each column a contiguous row, reversed if needed,
+    # rather than a strided view (always a copy, never a view of va_df)
+    fp = np.array(mat.T, order='C')
+    renorm = ~np.isin(keys, metakeys)
+    sameorder = xp.shape == x.shape and np.allclose(xp, x)
+    reverseorder = xp.shape == x.shape and np.allclose(xp[::-1], x)
+    if sameorder or reverseorder:
+        # the grids already match (in either order), so only renormalize;
+        # fp is a private copy and is reused as the output unless the
+        # inputs are needed for verbose output below
+        outmat = fp if sameorder else fp[:, ::-1]
+        if verbose > 1:
+            outmat = outmat.copy()
+        outmat[renorm] /= outmat[renorm].sum(axis=1, keepdims=True)
+    else:
+        idx = np.searchsorted(xp, x, side='right') - 1
+        idx = np.clip(idx, 0, xp.size - 2)
+        # repeated levels give zero-width segments; like np.interp, use
+        # the last duplicate there (weight 1 on idx + 1)
+        dx = xp[idx + 1] - xp[idx]
+        w = np.divide(x - xp[idx], dx, out=np.ones_like(dx), where=dx != 0)
+        w = np.clip(w, 0, 1)
+        # levels below xp[0] get zero weights (np.interp left=0)
+        above = x >= xp[0]
+        wlo = (1 - w) * above
+        whi = w * above
+        outmat = np.empty((len(keys), x.size), dtype='d')
+        _interp_norm(fp, idx, wlo, whi, renorm, outmat)
+
+    if verbose:
+        # report once after the computation; arrays only at verbose > 1
+        lines = [f'xp: {xp}']
+        for key, kfp, kout in zip(keys, fp, outmat):
+            lines.append(key)
+            if verbose > 1:
+                lines.extend([str(kfp), str(kout)])
+        print('\n'.join(lines), flush=True)
+
+    if 'Sigma' in keys:
+        outmat[keys.index('Sigma')] = x
+    else:
+        keys.append('Sigma')
+        outmat = np.concatenate([outmat, x[None, :]])
+        renorm = np.append(renorm, False)
+    return keys, outmat, renorm
+
+
 def interp_va(
-    va_df, vglvls, vgtop=5000., psfc=101325., metakeys=None, verbose=False
+    va_df, vglvls, vgtop=5000., psfc=101325., metakeys=None, verbose=0,
+    dtype='f'
 ):
     """
     Interpolate vertical allcoation dataframe to new vglvls
@@ -63,42 +205,25 @@ def interp_va(
     metakeys : list or None
         list of keys that should *not* be renormalized to 1 (default
         ['Sigma', 'Alt', 'L'])
-    verbose : bool
-        show warnings
+    verbose : int
+        count of verbosity level; above 1 also prints the input and output
+        values of each column
+    dtype : str or numpy.dtype
+        type of the renormalized (fraction) output columns (default 'f' to
+        match the float32 IOAPI outputs). Interpolation is done in float64
+        and the metakeys columns stay float64.
 
     Returns
     out_df : pandas.DataFrame
         vertical allocation data consistent with vglvls
     """
-    from collections import OrderedDict
-    x = vglvls[1:]
-    if metakeys is None:
-        metakeys = ['Sigma', 'Alt', 'L']
-    xp = (va_df.Pressure.values - vgtop) / (psfc - vgtop)
-
-    if xp[-1] < xp[0]:
-        xp = xp[::-1]
-        invert = True
-    else:
-        invert = False
-    out = OrderedDict()
-
-    for key in va_df.columns:
-        fp = va_df[key].values
-        if invert:
-            fp = fp[::-1]
-        out[key] = np.interp(x, xp, fp, left=0)
-        if key not in metakeys:
-            out[key] /= out[key].sum()
-        if verbose:
-            print(key)
-            print(xp)
-            print(fp)
-            print(out[key])
-
-    outdf = pd.DataFrame.from_dict(out)
-    outdf['Sigma'] = x
-    return outdf
+    keys, outmat, renorm = _interp_va_mat(
+        va_df, vglvls, vgtop=vgtop, psfc=psfc, metakeys=metakeys,
+        verbose=verbose
+    )
+    # outmat.T is wrapped as-is; only the fraction columns are cast
+    outdf = pd.DataFrame(outmat.T, columns=keys, copy=False)
+    return outdf.astype({k: dtype for k, r in zip(keys, renorm) if r})
 
 
 def dfmake3d(
@@ -159,12 +284,26 @@ def make3d(infile, layerfractions, vglvls):
     Returns
     -------
     """
+    layerfractions = np.asarray(layerfractions)
     nz = layerfractions.shape[0]
-    outfile = infile.slice(LAY=[0]*nz)
-
-    for key, var in outfile.variables.items():
-        if key != 'TFLAG':
-            var[:] *= layerfractions[None, :, None, None]
+    # only layer 0 is read; it is broadcast to nz layers by the multiply
+    outfile = infile.slice(LAY=[0])
+    outfile.createDimension('LAY', nz)
+
+    laykeys = [
+        key for key, var in outfile.variables.items()
+        if 'LAY' in var.dimensions
+    ]
+    for key in laykeys:
+        invar = outfile.variables[key]
+        # match the variable type so float32 data is not upcast
+        lf = _fractions_as(layerfractions, invar.dtype)
+        outvar = outfile.copyVariable(invar, key=key, withdata=False)
+        # the sliced file is in memory, so the product is written directly
+        # into the new variable's storage
+        np.multiply(
+            invar[:], lf[None, :, None, None], out=outvar.view(np.ndarray)
+        )
     outfile.VGLVLS = vglvls.astype('f')
     outfile.NLAYS = nz
     return outfile
@@ -174,7 +313,7 @@ class Vertical:
     def __init__(
         self, csvpath, outvglvls, outvgtop, read_kwds=None,
         pressurekey='Pressure', sigmakey='Sigma', csvvgtop=5000.,
-        metakeys=None, psfc=101325., prune=True, verbose=0
+        metakeys=None, psfc=101325., prune=True, verbose=0, sectors=None
     ):
         """
         Arguments
@@ -187,6 +326,11 @@ class Vertical:
             outvglvls[1:] will be use for interpolation
         outvgtop : float
             top of the model atmosphere for output
+        read_kwds : mappable or None
+            keywords for pandas.read_csv, which update the defaults
+            comment='#', engine='c', and float_precision='high'. By default,
+            allocation columns are read as float32 while metakeys stay
+            float64.
         pressurekey : str
             key in csv that holds or will hold Pressure
         sigmakey : str
@@ -202,12 +346,17 @@ class Vertical:
             remove unnecessary levels
         verbose : int
             count of verbosity level
+        sectors : list or None
+            If provided, only these csv keys (and metakeys) are read
 
         Returns
         -------
         """
+        from collections import defaultdict
         if read_kwds is None:
-            read_kwds = dict(comment='#')
+            read_kwds = {}
+        if metakeys is None:
+            metakeys = [sigmakey, pressurekey, 'Alt', 'L']
         self.pressurekey = pressurekey
         self.sigmakey = sigmakey
         self.verbose = verbose
@@ -215,9 +364,17 @@ class Vertical:
         self.outvgtop = outvgtop
         self.psfc = psfc
 
-        self.indf = pd.read_csv(csvpath, **read_kwds)
-        if metakeys is None:
-            metakeys = [self.sigmakey, self.pressurekey, 'Alt', 'L']
+        dtype = defaultdict(
+            lambda: np.float32, {k: np.float64 for k in metakeys}
+        )
+        csv_kwds = dict(
+            comment='#', engine='c', float_precision='high', dtype=dtype
+        )
+        if sectors is not None:
+            usekeys = set(metakeys).union(sectors)
+            csv_kwds['usecols'] = lambda key: key in usekeys
+        csv_kwds.update(read_kwds)
+        self.indf = pd.read_csv(csvpath, **csv_kwds)
 
         self.metakeys = metakeys
 
@@ -227,24 +384,64 @@ class Vertical:
                 pressurekey=pressurekey, inplace=True
             )
 
-        outdf = interp_va(
+        # work on the (columns, levels) matrix and build one DataFrame at
+        # the end with only the layers that are used
+        keys, outmat, _ = _interp_va_mat(
             self.indf, outvglvls[1:], vgtop=outvgtop, psfc=psfc,
             metakeys=metakeys, verbose=self.verbose
         )
-        outdf.loc[:, 'LAYER1'] = 0
-        outdf.loc[0, 'LAYER1'] = 1
-        layerused = outdf.drop(self.metakeys, axis=1).values.sum(1) > 0
+        layer1 = np.zeros((1, outmat.shape[1]), dtype=outmat.dtype)
+        layer1[0, 0] = 1
+        keys.append('LAYER1')
+        outmat = np.concatenate([outmat, layer1])
+        ismeta = np.isin(keys, self.metakeys)
+        sectorkeys = [k for k, meta in zip(keys, ismeta) if not meta]
+        # fractions only depend on the csv and outvglvls, so they are kept
+        # as a float32 (sectors, layers) array; each sector's row is
+        # contiguous for the broadcast multiply in allocate
+        fractions = outmat[~ismeta]
+        layerused = np.any(fractions > 0, axis=0)
         layerused[0] = True
         if not prune:
             layerused[:] = True
-        self.outdf = outdf.loc[layerused]
+        # metakeys stay float64; only the sector fractions are float32
+        self.outdf = pd.DataFrame(
+            outmat[:, layerused].T, columns=keys,
+            index=np.flatnonzero(layerused)
+        ).astype({k: 'f' for k in sectorkeys})
+        self._fractions = np.ascontiguousarray(
+            fractions[:, layerused], dtype='f'
+        )
+        self._sector_index = {k: i for i, k in enumerate(sectorkeys)}
+
+    def _apply_fractions(self, var1lay, sector, out):
+        """
+        Arguments
+        ---------
+        var1lay : array
+            layer 0 values with shape (TSTEP, 1, ROW, COL)
+        sector : str
+            csv key whose layer fractions should be applied
+        out : array
+            preallocated output with shape (TSTEP, nz, ROW, COL); the
+            product is written directly into it
+
+        Returns
+        -------
+        out : array
+        """
+        lf = self._fractions[self._sector_index[sector]]
+        lf = _fractions_as(lf, out.dtype)
+        return np.multiply(var1lay, lf[None, :, None, None], out=out)
 
     def allocate(self, infile, alloc_keys, outpath=None, save_kwds=None):
         """
         Arguments
         ---------
         infile : str or PseudoNetCDFFile
-            file to allocate vertically
+            file to allocate vertically; str paths are opened as ioapi. For
+            IOAPI files, VAR-LIST, NVARS, and TFLAG are updated to match the
+            allocated variables. Allocated variables must be floating point.
         alloc_keys : mappable  or str
             each key should exist in the vertical allocation file, and values
             should correspond to variables in the infile. If is a str, then
@@ -287,21 +484,57 @@ class Vertical:
             else:
                 assigned_keys.extend(varkeys)
 
-        unassigned_keys = list(set(all_keys).difference(assigned_keys))
+        # keeps the infile variable order (set difference did not)
+        all_arr = np.array(all_keys)
+        isassigned = np.isin(all_arr, np.array(assigned_keys))
+        unassigned_keys = all_arr[~isassigned].tolist()
         if len(isnone) > 1:
             raise ValueError(f'Can only have 1 None sector; got {isnone}')
         if len(isnone) == 1:
             alloc_keys[isnone[0]] = unassigned_keys
 
-        sectorfiles = []
+        # one output file is filled in place; each variable is written once
+        # from layer 0 of the input using its sector's layer fractions. The
+        # last sector listing a variable wins, so each output variable is
+        # written by exactly one task
+        keysector = {}
         for sector, varkeys in alloc_keys.items():
-            layerfractions = self.outdf.loc[:, sector]
-            sectorfile = make3d(
-                infile.subset(varkeys), layerfractions, self.outvglvls
+            for key in varkeys:
+                keysector[key] = sector
+
+        # layer 0 of each input variable is read exactly once, and all file
+        # reads and variable creation happen before the parallel fill
+        base = {}
+        for key in keysector:
+            base[key] = infile.variables[key][:, 0:1]
+
+        nz = self.outdf.shape[0]
+        outfile = infile.subset([])
+        outfile.createDimension('LAY', nz)
+        for key in keysector:
+            outfile.copyVariable(
+                infile.variables[key], key=key, withdata=False
+            )
+
+        def _fill(item):
+            key, sector = item
+            outvar = outfile.variables[key]
+            self._apply_fractions(
+                base[key], sector, out=outvar.view(np.ndarray)
             )
-            sectorfiles.append(sectorfile)
 
-        outfile = sectorfiles[0].stack(sectorfiles[1:], stackdim='TSTEP')
+        # the multiplies release the GIL, so threads overlap the variables;
+        # products go straight into the output, so no worker holds a
+        # full-size temporary. Few workers saturate memory bandwidth.
+        nworkers = max(1, min(len(keysector), 4, os.cpu_count() or 1))
+        with ThreadPoolExecutor(max_workers=nworkers) as executor:
+            list(executor.map(_fill, keysector.items()))
+
+        if hasattr(outfile, 'updatemeta'):
+            # IOAPI files need VAR-LIST, NVARS, and TFLAG rebuilt
+            outfile.updatemeta()
+        outfile.VGLVLS = np.asarray(self.outvglvls).astype('f')
+        outfile.NLAYS = nz
         if outpath is not None:
             return outfile.save(outpath, **save_kwds)
         else: